@@ -51,6 +51,9 @@ setup(
     install_requires=[
         "django>=3.2"
     ],
+    extras_require={
+        "bulk-load": ["django-bulk-load"],
+    },
     zip_safe=False,
     classifiers=[
         "Development Status :: 4 - Beta",
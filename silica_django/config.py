@@ -4,14 +4,10 @@ class SilicaConfig:
         For now, no configuration is available, but planned features include the ability to set the JSONForms
         validation mode.
     """
-    
-    config = None
-    
+
     def __init__(self, **kwargs):
-        if self.config is None:
-            self.config = {}
         # key is field_name, value is SilicaFieldConfig for that field
-        self.config.update(kwargs)
+        self.config = dict(kwargs)
 
     def get_field_config(self, field_name):
         return self.config.get(field_name, None)
@@ -25,11 +21,9 @@ class SilicaFieldConfig:
         schema, but all fields are optional; a silica-powered form will always generate
         enough for a functional render on its own.
     """
-    
-    rule = None
-    schema = None
-    uischema = None
-    
+
+    __slots__ = ('rule', 'schema', 'uischema')
+
     def __init__(self, rule=None, maximum=None, minimum=None, default=None, min_length=None, 
                  max_length=None, description=None, type=None, schema_format=None, label=None, 
                  scope=None, ui_options=None, detail=None, show_sort_buttons=None, element_label_prop=None, 
@@ -38,43 +32,45 @@ class SilicaFieldConfig:
                  max_item_text=None, css_classes=None, wrapper_css_classes=None):
         # build kwargs into the uischema and schema objects formatted as jsonschema expects
         self.rule = rule
-        schema = {
-            'maximum': maximum,
-            'minimum': minimum,
-            'default': default,
-            'minLength': min_length,
-            'maxLength': max_length,
-            'description': description,
-            'type': type,
-            'format': schema_format,
-            'multipleOf': multiple_of,
-            'examples': examples,
-            'title': title,
-            'errorMessage': error_message,
-        }
-        uischema_options = ui_options
-        uischema = {
-            'label': label,
-            'scope': scope,
-            'options': {
-                'detail': detail,
-                'showSortButtons': show_sort_buttons,
-                'elementLabelProp': element_label_prop,
-                'format': ui_format,
-                # silica custom UISchema properties
-                'readOnly': readonly,
-                'displayDelete': display_delete,
-                'enableAddButton': enable_add,
-                'noDataMsg': no_data_msg,
-                'staticTitle': static_title,
-                'addText': add_text,
-                'maxItemText': max_item_text,
-                'overrideCss': css_classes,
-                'wrapperOverrideCss': wrapper_css_classes,
-            }
-        }
-        if uischema_options:
-            uischema['options'].update(uischema_options)
-        self.schema = {k: v for k, v in schema.items() if v is not None}
-        uischema['options'] = {k: v for k, v in uischema['options'].items() if v is not None}
-        self.uischema = {k: v for k, v in uischema.items() if v is not None}
+        self.schema = {k: v for k, v in (
+            ('maximum', maximum),
+            ('minimum', minimum),
+            ('default', default),
+            ('minLength', min_length),
+            ('maxLength', max_length),
+            ('description', description),
+            ('type', type),
+            ('format', schema_format),
+            ('multipleOf', multiple_of),
+            ('examples', examples),
+            ('title', title),
+            ('errorMessage', error_message),
+        ) if v is not None}
+        uischema_options = {k: v for k, v in (
+            ('detail', detail),
+            ('showSortButtons', show_sort_buttons),
+            ('elementLabelProp', element_label_prop),
+            ('format', ui_format),
+            # silica custom UISchema properties
+            ('readOnly', readonly),
+            ('displayDelete', display_delete),
+            ('enableAddButton', enable_add),
+            ('noDataMsg', no_data_msg),
+            ('staticTitle', static_title),
+            ('addText', add_text),
+            ('maxItemText', max_item_text),
+            ('overrideCss', css_classes),
+            ('wrapperOverrideCss', wrapper_css_classes),
+        ) if v is not None}
+        if ui_options:
+            for k, v in ui_options.items():
+                # an explicit None in ui_options removes the option
+                if v is None:
+                    uischema_options.pop(k, None)
+                else:
+                    uischema_options[k] = v
+        self.uischema = {k: v for k, v in (
+            ('label', label),
+            ('scope', scope),
+            ('options', uischema_options),
+        ) if v is not None}
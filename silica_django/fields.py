@@ -1,8 +1,21 @@
 from collections import defaultdict
+from operator import attrgetter
 
 from django import forms
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import transaction
+from django.db import connections, transaction
+from django.forms.models import model_to_dict
+from django.utils.functional import cached_property
+
+try:
+    # optional: streams bulk writes through COPY on PostgreSQL
+    from django_bulk_load import bulk_insert_models, bulk_update_models
+except ImportError:
+    bulk_insert_models = None
+    bulk_update_models = None
+
+DEFAULT_BULK_BATCH_SIZE = 100
 
 
 class SilicaSubFormArrayField(forms.Field):
@@ -18,6 +31,11 @@ class SilicaSubFormArrayField(forms.Field):
 
         To customize the behavior of this field, subclass it and implement your own handler functions as needed.
 
+        Bulk writes are done in batches of batch_size rows. This can be set per field (as a class attribute or the
+        batch_size kwarg) or project-wide with the SILICA_BULK_BATCH_SIZE setting, which defaults to 100. The best value
+        depends on the database and the width of the rows, so it may be convenient to read it from the environment, e.g.
+        SILICA_BULK_BATCH_SIZE = int(os.environ.get('SILICA_BULK_BATCH_SIZE', 100)).
+
         TODO: support usage in non-model Forms
 
     """
@@ -25,71 +43,165 @@ class SilicaSubFormArrayField(forms.Field):
     instance_form = None
     identifier_field = 'pk'
     queryset = None
-    batch_size = 200
+    # relations to load alongside the queryset; list any ForeignKeys (or reverse/many-to-many relations) the item form
+    # reads so that instantiating a form per row does not query once per row
+    select_related = ()
+    prefetch_related = ()
+    # if not set, this falls back to settings.SILICA_BULK_BATCH_SIZE
+    batch_size = None
+    # when the database supports it, write creates and updates with an upsert rather than separate bulk statements.
+    # This is opt-in: bulk_create still writes objects with and without a primary key in separate INSERTs, and an
+    # upsert writes every column of the updated instances rather than only the item form's fields
+    use_upsert = False
+    # when django-bulk-load is installed and the database is PostgreSQL, write creates and updates via COPY
+    use_bulk_load = True
+    # skip validating and re-saving submitted rows whose values match the existing object. This also skips the item
+    # form's clean() for those rows, so it is only safe when that validation depends on nothing but the row's own values.
+    # Skipped rows are left out of the field's cleaned_data. Rows are compared using the fields of an unbound item form
+    # built with parent_instance, so changes its __init__ makes for a particular instance are not taken into account.
+    skip_unchanged = False
     min_instances = 0
     max_instances = None
     # this value must be set by the initialization of the form
     parent_instance = None
 
-    _instantiated_forms = []
-    # the list of update errors by pk of object
-    _update_errors = defaultdict(list)
-    # the list of errors for this field (database errors)
-    _errors = []
-    _qs_lookup = None
-    _raw = None
-
-    def __init__(self, *args, queryset=None, **kwargs):
+    def __init__(self, *args, queryset=None, batch_size=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self._reset_state()
         if not self.instance_form:
             raise NotImplementedError("You must define instance_form to use this field")
-        if not issubclass(self.instance_form, forms.models.ModelForm):
-            raise TypeError("instance_form must subclass ModelForm")
-        if queryset:
+        if queryset is not None:
             self.queryset = queryset
+        self._update_field_names = self._get_update_field_names()
+        self._loaded_field_names = self._get_loaded_field_names()
+        if batch_size:
+            self.batch_size = batch_size
+        elif self.batch_size is None:
+            self.batch_size = getattr(settings, 'SILICA_BULK_BATCH_SIZE', DEFAULT_BULK_BATCH_SIZE)
+
+    def __init_subclass__(cls, **kwargs):
+        # check instance_form once, when the field class is defined, rather than every time the field is instantiated
+        super().__init_subclass__(**kwargs)
+        if cls.instance_form is not None and not issubclass(cls.instance_form, forms.models.ModelForm):
+            raise TypeError("instance_form must subclass ModelForm")
+
+    def __deepcopy__(self, memo):
+        # each form instance gets a (shallow) copy of the declared field, so per-submission state must not be shared
+        result = super().__deepcopy__(memo)
+        result._reset_state()
+        return result
+
+    def _reset_state(self):
+        # the list of update errors by pk of object
+        self._update_errors = defaultdict(list)
+        # the list of errors for this field (database errors)
+        self._errors = []
+        self._qs_lookup = None
+        # the evaluated results of the queryset as of the last call to refresh_data
+        self._queryset_list = None
+        self._raw = None
+        # (pk, form) pairs for the submitted items, as validated by to_python
+        self._validated = None
+        # the data schema of a single item, as built by get_item_schema
+        self._item_schema = None
+
+    def _get_update_field_names(self):
+        """
+        Returns the names of the model fields written by bulk updates: the concrete, non-primary-key model fields
+        that appear on instance_form. Meta.fields cannot be used directly as it may be '__all__' or unset.
+        """
+        model_fields = {field.name: field for field in self.instance_form._meta.model._meta.concrete_fields}
+        return tuple(
+            name for name in self.instance_form.base_fields
+            if name in model_fields and not model_fields[name].primary_key
+        )
+
+    def _get_loaded_field_names(self):
+        """ Returns the names of the model fields which must be loaded for each row; all other columns are deferred """
+        pk_name = self.instance_form._meta.model._meta.pk.name
+        identifier = pk_name if self.identifier_field == 'pk' else self.identifier_field
+        return tuple(dict.fromkeys((pk_name, identifier, *self._update_field_names)))
 
     def get_queryset(self):
-        if self.queryset:
+        # compare against None, as the truthiness of a queryset evaluates it
+        if self.queryset is not None:
             # this should force a refresh of the queryset
-            return self.queryset.all()
+            queryset = self.queryset.all()
         else:
-            return self.instance_form.Meta.model.objects.all()
+            queryset = self.instance_form.Meta.model.objects.all()
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
 
     @property
     def qs_lookup(self):
-        if not self._qs_lookup:
-            self._qs_lookup = {item[self.identifier_field]: item for item in self.get_queryset()}
+        # compare against None so that an empty lookup is not rebuilt on every access
+        if self._qs_lookup is None:
+            if self._queryset_list is None:
+                # share a single evaluation of the queryset between the lookup and anything else that needs it
+                self.refresh_queryset()
+            # build the lookup once; items are then found in O(1) rather than with one query per submitted item
+            items = self._queryset_list
+            self._qs_lookup = dict(zip(map(attrgetter(self.identifier_field), items), items))
         return self._qs_lookup
 
     def prepare_for_commit(self, data):
         updates = []
         creates = []
         if data:
-            for item in data:
-                # the identifier field will either be the empty string or the correct value for the object
-                pk = item.pop(self.identifier_field, None)
+            # reuse the forms validated by to_python rather than validating every item a second time
+            validated = self._validated if self._validated is not None else self._validate_items(data)
+            for pk, form in validated:
                 if pk:
-                    # if the item already has a pk, we are updating
-                    update = self.handle_update(pk, item)
+                    # if the item already has a pk, we are updating. The instance was validated before the rows were
+                    # locked, so skip any row that has since been deleted rather than writing it back
+                    if self._coerce_identifier(pk) not in self.qs_lookup:
+                        self._update_errors[pk].append(f"The item {pk} was deleted before it could be saved.")
+                        continue
+                    update = self.handle_update(pk, form)
                     if update:
                         updates.append(update)
                 else:
                     # if the item does not have a pk, we are creating
-                    create = self.handle_create(item)
+                    create = self.handle_create(form)
                     if create:
                         creates.append(create)
         return creates, updates
 
     def handle_delete(self, data):
         items_to_delete = self.get_items_to_delete(data)
+        if items_to_delete is None:
+            # nothing was removed, so skip the DELETE entirely
+            return
         self.perform_delete(items_to_delete)
 
     def get_items_to_delete(self, data):
+        """
+        Returns a queryset of the existing items which are not present in data, or None if there are none
+        """
         if not data:
             data = []
         key = self.identifier_field
-        item_keys = [datum[key] for datum in data if key in datum]
-        return self.queryset.exclude(**{f'{key}__in': item_keys})
+        submitted_keys = set()
+        for datum in data:
+            value = datum.get(key)
+            # new items are submitted with an empty identifier, which can never match an existing row
+            if not value:
+                continue
+            # submitted keys may arrive as strings, so convert them exactly as _lookup_instance does
+            try:
+                submitted_keys.add(self._coerce_identifier(value))
+            except ValidationError:
+                # an identifier which cannot be converted cannot match an existing row either
+                continue
+        # the existing keys are already in memory, so the set difference costs no query
+        keys_to_delete = [existing_key for existing_key in self.qs_lookup if existing_key not in submitted_keys]
+        if not keys_to_delete:
+            return None
+        # build from a fresh queryset rather than the evaluated one so that no results are re-fetched before the delete
+        return self.get_queryset().filter(**{f'{key}__in': keys_to_delete})
 
     def perform_delete(self, qs):
         """
@@ -105,60 +217,137 @@ class SilicaSubFormArrayField(forms.Field):
         except Exception as e:
             self._errors.append(f"There was an error deleting items. {repr(e)}")
 
-    def prepare_create(self, item):
+    def prepare_create(self, form):
         """
 
         Args:
-            item: a dictionary representing the keys and values from the submitted form
+            form: the validated instance_form for the submitted item
 
         Returns:
             A Django Model object which can be passed to bulk_create
         """
-        return self.queryset.model(item)
+        # ModelForm validation has already applied the cleaned data to form.instance
+        return form.instance
 
-    def handle_create(self, item):
-        form = self.validate_against_form(item)
+    def handle_create(self, form):
+        """
+        Args:
+            form: the already-validated instance_form for the submitted item
+        """
         if not form.errors:
-            return self.prepare_create(form.cleaned_data)
+            return self.prepare_create(form)
         else:
             self._errors.append(f"There was an error creating an item. {form.errors}")
             return None
 
-    def prepare_update(self, pk, item):
+    def prepare_update(self, pk, form):
         """
 
         Args:
             pk: the primary key of the object to be updated
-            item: a dictionary representing the keys and values from the submitted form
+            form: the validated instance_form for the submitted item, bound to the existing object
 
         Returns:
             A Django Model object which can be passed to bulk_update
         """
-        return self.queryset.model(item, **{self.identifier_field: pk})
+        # ModelForm validation has already applied the cleaned data to the existing instance
+        return form.instance
 
-    def handle_update(self, pk, item):
-        instance = self.qs_lookup[pk]
-        form = self.validate_against_form(item, instance=instance)
+    def handle_update(self, pk, form):
+        """
+        Args:
+            pk: the primary key of the object to be updated
+            form: the already-validated instance_form for the submitted item, bound to the existing object
+        """
         if not form.errors:
-            return self.prepare_update(pk, form.cleaned_data)
+            return self.prepare_update(pk, form)
         else:
             self._update_errors[pk].append(form.errors)
             return None
 
-    def _instantiate_form(self, data=None, instance=None):
+    @cached_property
+    def _uses_silica_form(self):
         # local import required to prevent cyclical imports
         from silica_django.forms import SilicaFormMixin
+        return issubclass(self.instance_form, SilicaFormMixin)
+
+    def _instantiate_form(self, data=None, instance=None):
         # if the form subclasses silica form, include parent_instance as a kwarg
         kwargs = {'data': data, 'instance': instance}
-        if issubclass(self.instance_form, SilicaFormMixin):
+        if self._uses_silica_form:
             kwargs['parent_instance'] = self.parent_instance
         return self.instance_form(**kwargs)
 
-    def refresh_data(self):
+    def get_item_schema(self):
+        """ Returns the data schema of a single item of this array, including its hidden identifier """
+        if self._item_schema is None:
+            # the item schema does not depend on any instance, so an unbound form is enough to generate it
+            item_schema = self._instantiate_form().get_data_schema()
+            item_schema["properties"][self.identifier_field] = {
+                "type": "number",
+                "hidden": True
+            }
+            self._item_schema = item_schema
+        return self._item_schema
+
+    def refresh_queryset(self, select_for_update=False):
+        """
+        Re-evaluates the queryset without instantiating any forms; this is all that is needed to save
+
+        Args:
+            select_for_update: if True, lock the rows of the queryset until the end of the current transaction. Only
+                the rows of the queryset's own table are locked, not those of any tables joined into it.
+        """
         self.queryset = self.get_queryset()
-        self._instantiated_forms = [self._instantiate_form(instance=instance) for instance in self.queryset]
-        self.initial = [{**form.initial, f'{self.identifier_field}': getattr(form.instance, self.identifier_field)}
-                        for form in self._instantiated_forms]
+        queryset = self.queryset
+        query = queryset.query
+        # only the columns the item form uses are needed, so skip hydrating the rest. A custom queryset which already
+        # restricts its columns, or which follows relations with select_related, is left alone as only() would conflict.
+        # A prefetch would lazily load each deferred foreign key column per row, as would an upsert, which inserts every
+        # column of the updated instances.
+        if (not query.select_related and not queryset._prefetch_related_lookups and not query.deferred_loading[0]
+                and not self.supports_upsert()):
+            queryset = queryset.only(*self._loaded_field_names)
+        if select_for_update:
+            connection = connections[queryset.db]
+            if connection.features.has_select_for_update_of:
+                queryset = queryset.select_for_update(of=('self',))
+            else:
+                queryset = queryset.select_for_update()
+        # evaluate the queryset exactly once; everything else reads from this list
+        self._queryset_list = list(queryset)
+        # the lookup must be rebuilt alongside the queryset or it will return stale instances
+        self._qs_lookup = None
+        # initial is recalculated from the new results the next time it is read
+        self._initial_stale = True
+
+    def refresh_data(self):
+        """ Re-evaluates the queryset and recalculates the initial values of the field for rendering """
+        self.refresh_queryset()
+        self._compute_initial()
+
+    def _compute_initial(self):
+        # this is exactly what a ModelForm uses as its initial data, without the cost of building a form per row
+        meta = self.instance_form._meta
+        get_identifier = attrgetter(self.identifier_field)
+        self._initial = [
+            {**model_to_dict(instance, fields=meta.fields, exclude=meta.exclude),
+             self.identifier_field: get_identifier(instance)}
+            for instance in self._queryset_list
+        ]
+        self._initial_stale = False
+
+    @property
+    def initial(self):
+        # instantiating a form per row is only needed for rendering, so it is deferred until initial is actually read
+        if self._initial_stale:
+            self._compute_initial()
+        return self._initial
+
+    @initial.setter
+    def initial(self, value):
+        self._initial = value
+        self._initial_stale = False
 
     def validate_against_form(self, form_data, instance=None):
         """ Ensure that data being passed from frontend validates against form """
@@ -179,42 +368,145 @@ class SilicaSubFormArrayField(forms.Field):
             if errors:
                 raise ValidationError(errors)
 
-    def data_as_forms(self, data):
-        # transforms raw data into a list of forms
-        forms = []
+    def _coerce_identifier(self, value):
+        """ Converts a submitted identifier, which may arrive as a string, to the type of the model's identifier """
+        # the model is read from the form, as self.queryset is only set once qs_lookup has evaluated it
+        model_meta = self.instance_form._meta.model._meta
+        identifier_field = model_meta.pk if self.identifier_field == 'pk' else model_meta.get_field(self.identifier_field)
+        return identifier_field.to_python(value)
+
+    def _lookup_instance(self, pk):
+        """ Finds the existing object for a submitted identifier, which may arrive as a string """
+        try:
+            return self.qs_lookup[self._coerce_identifier(pk)]
+        except KeyError:
+            raise ValidationError(f"The item {pk} does not exist or can no longer be edited.")
+
+    def _validate_items(self, data):
+        """ Validates each submitted item against instance_form, returning a list of (pk, form) pairs """
+        validated = []
+        # the fields to compare unchanged rows against, built only if there is an existing row to compare
+        compare_fields = None
         for item in data:
-            # the identifier field will either be the empty string or the correct value for the object
-            pk = item.pop(self.identifier_field, None)
+            # the identifier field will either be the empty string or the correct value for the object. The submitted
+            # data is read rather than mutated, as get_items_to_delete still needs the identifiers.
+            pk = item.get(self.identifier_field) or None
+            form_data = {k: v for k, v in item.items() if k != self.identifier_field}
             instance = None
             if pk:
-                instance = self.qs_lookup[pk]
-            form = self.validate_against_form(item, instance=instance)
-            forms.append(form)
-        return forms
+                instance = self._lookup_instance(pk)
+                if self.skip_unchanged:
+                    if compare_fields is None:
+                        compare_fields = self._instantiate_form().fields
+                    if not self._item_has_changed(form_data, instance, compare_fields):
+                        # nothing to validate or write for a row the user did not edit
+                        continue
+            validated.append((pk, self.validate_against_form(form_data, instance=instance)))
+        return validated
+
+    def _item_has_changed(self, form_data, instance, fields):
+        """
+        Compares submitted data to an existing instance using the given form fields, without binding or cleaning a form
+        for the row. Anything the comparison cannot account for counts as a change.
+        """
+        initial = model_to_dict(instance, fields=list(fields))
+        for name, field in fields.items():
+            if name not in form_data:
+                return True
+            initial_value = initial[name] if name in initial else field.initial
+            if callable(initial_value):
+                initial_value = initial_value()
+            if field.has_changed(initial_value, form_data[name]):
+                return True
+        return False
+
+    def data_as_forms(self, data):
+        # transforms raw data into a list of forms; these are kept so that saving does not have to validate again
+        self._validated = self._validate_items(data)
+        return [form for _, form in self._validated]
+
+    def supports_bulk_load(self):
+        """ Whether creates and updates can be streamed to the database through django-bulk-load """
+        if not self.use_bulk_load or bulk_insert_models is None:
+            return False
+        return connections[self.queryset.db].vendor == 'postgresql'
+
+    def supports_upsert(self):
+        """ Whether creates and updates can be written in a single INSERT ... ON CONFLICT DO UPDATE statement """
+        # bulk load is preferred where available, as it avoids building one large SQL statement for all rows
+        if not self.use_upsert or self.supports_bulk_load():
+            return False
+        # bulk_create cannot write a multi-table inherited model
+        if self.instance_form._meta.model._meta.parents:
+            return False
+        connection = connections[self.queryset.db]
+        # this feature flag was added in Django 4.1, so older versions always fall back to separate statements
+        return getattr(connection.features, 'supports_update_conflicts_with_target', False)
+
+    def perform_upsert(self, objs):
+        """
+        Creates and updates objs in one round-trip; objects with a primary key that already exists are updated in place
+
+        Args:
+            objs: a list of Django Model objects, as returned by prepare_create and prepare_update
+        """
+        if not objs:
+            return
+        model = self.queryset.model
+        unique_field = model._meta.pk.name if self.identifier_field == 'pk' else self.identifier_field
+        try:
+            model.objects.bulk_create(objs, batch_size=self.batch_size, update_conflicts=True,
+                                      unique_fields=[unique_field], update_fields=self._update_field_names)
+        except Exception as e:
+            self._errors.append(f"There was an error saving objects. {repr(e)}")
+
+    def perform_create(self, creates):
+        if not creates:
+            return
+        try:
+            if self.supports_bulk_load():
+                bulk_insert_models(creates)
+            else:
+                self.queryset.model.objects.bulk_create(creates, batch_size=self.batch_size)
+        except Exception as e:
+            self._errors.append(f"There was an error creating new objects. {repr(e)}")
+
+    def perform_update(self, updates):
+        if not updates:
+            return
+        try:
+            if self.supports_bulk_load():
+                bulk_update_models(updates, update_field_names=list(self._update_field_names))
+            else:
+                self.queryset.model.objects.bulk_update(updates, self._update_field_names,
+                                                        batch_size=self.batch_size)
+        except Exception as e:
+            self._errors.append(f"There was an error updating existing objects. {repr(e)}")
 
     def do_save(self):
         data = self._raw
-        self.refresh_data()
+        if not data and not self.get_queryset().exists():
+            # nothing was submitted and there is nothing to delete, so there is nothing to save
+            return
         with transaction.atomic():
+            # the lock is only meaningful inside the transaction, so the rows must be fetched inside it. Saving only
+            # needs the instances, not a rendered form per instance.
+            self.refresh_queryset(select_for_update=True)
             # handle deletes
             self.handle_delete(data)
             creates, updates = self.prepare_for_commit(data)
-            if creates:
-                try:
-                    self.queryset.model.objects.bulk_create(creates, batch_size=self.batch_size)
-                except Exception as e:
-                    self._errors.append(f"There was an error creating new objects. {repr(e)}")
-            if updates:
-                try:
-                    self.queryset.model.objects.bulk_update(updates, self.instance_form._meta.fields,
-                                                            batch_size=self.batch_size)
-                except Exception as e:
-                    self._errors.append(f"There was an error updating existing objects. {repr(e)}")
-        # force form to re-do queryset and re-calculate initial values so that newly created & updated data is displayed on refresh
-        self.refresh_data()
+            if self.supports_upsert():
+                self.perform_upsert(creates + updates)
+            else:
+                self.perform_create(creates)
+                self.perform_update(updates)
+        # force form to re-do queryset so that newly created & updated data is displayed on refresh; initial values are
+        # only recalculated if they are used
+        self.refresh_queryset()
 
     def to_python(self, data):
         self._raw = data
+        self._validated = None
         if data in self.empty_values:
             return None
         return self.data_as_forms(data)
@@ -1,12 +1,23 @@
-from collections import defaultdict
-
 from django import forms
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
 
 from silica_django.fields import SilicaSubFormArrayField
-from silica_django.layout import Control, VerticalLayout, CustomHTMLElement
+from silica_django.layout import VerticalLayout, CustomHTMLElement
 from silica_django.mixins import JsonSchemaMixin
 
 
+# sentinel for instance attributes that do not exist, as None is a valid attribute value
+_MISSING = object()
+
+
+def _has_array_keys(data):
+    """ Cheaply checks whether submitted data contains any array field keys (<array_form_field>.<count>.<field>) """
+    if not data:
+        return False
+    return any(isinstance(key, str) and '.' in key for key in data)
+
+
 class SilicaFormMixin(JsonSchemaMixin, forms.Form):
     """ Adds Silica functionality to any Django form.
 
@@ -19,52 +30,57 @@ class SilicaFormMixin(JsonSchemaMixin, forms.Form):
                          Note that rules will still be applied.
         @custom_ui_schema - a mapping of fields to a dictionary matching the UISchema pattern.
         @custom_components - a mapping of fields to the name of the custom Control renderer you want to use.
+        @static_schema - set to True if the form's fields, choices and configuration never change between instances;
+                         the data and ui schemas are then generated once per form class and reused on every render.
 
      """
     class Meta:
         silica_config = None
         layout = None
 
+    # Meta attributes, resolved once per form class by __init_subclass__
+    _silica_config = None
+    _silica_layout = None
+    _static_schema = False
+    # per-class schema caches, only used when Meta.static_schema is set
+    _cached_data_schema = None
+    _cached_ui_schema = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = getattr(cls, 'Meta', None)
+        cls._silica_config = getattr(meta, 'silica_config', None)
+        cls._silica_layout = getattr(meta, 'layout', None)
+        cls._static_schema = getattr(meta, 'static_schema', False)
+        # a subclass may change fields or config, so it must never reuse its parent's schemas
+        cls._cached_data_schema = None
+        cls._cached_ui_schema = None
+
     def __init__(self, *args, parent_instance=None, **kwargs):
         # if this form is an array item, it should have access to the instance of the form containing the array field
         self.parent_instance = parent_instance
-        # if we are intaking data from a POST via args, process it
+        # data may be passed either as the first positional arg or as the data kwarg; either way, process it
         new_args = [*args]
         new_kwargs = kwargs.copy()
-        if len(args) > 0:
-            # we have to mutate the querydict, so make a copy
-            raw_data = new_args[0].copy()
-            array_keys, array_info = self._extract_array_info(raw_data)
-            for key, values in array_info.items():
-                raw_data[key] = values
-            for key in array_keys:
-                # remove original, unprocessed data from args
-                del raw_data[key]
-            new_args = [raw_data, *args]
-        if 'data' in kwargs:
-            # it is also valid to pass data to a form as the data kwarg
-            orig_data = kwargs.pop('data') or {}
-            array_keys, array_info = self._extract_array_info(orig_data)
-            data = orig_data.copy()
-            for key, values in array_info.items():
-                data[key] = values
-            for key in array_keys:
-                # remove original, unprocessed data from kwargs
-                del data[key]
-            new_kwargs['data'] = data
+        raw_data = args[0] if args else kwargs.get('data')
+        # most forms have no array fields, in which case the data can be passed through without copying it
+        if _has_array_keys(raw_data):
+            data = self._process_array_data(raw_data)
+            if args:
+                new_args[0] = data
+            else:
+                new_kwargs['data'] = data
         self.instance = new_kwargs.get('instance')
         super().__init__(*new_args, **new_kwargs)
         self._setup_array_fields()
 
     def get_silica_config(self):
-        if hasattr(self.Meta, 'silica_config'):
-            return self.Meta.silica_config
-        return None
+        return self._silica_config
 
     def get_field_config(self, field_name):
         silica_config = self.get_silica_config()
         if silica_config:
-            return self.Meta.silica_config.get_field_config(field_name)
+            return silica_config.get_field_config(field_name)
         return None
     
     def _setup_array_fields(self):
@@ -72,45 +88,72 @@ class SilicaFormMixin(JsonSchemaMixin, forms.Form):
             if isinstance(field, SilicaSubFormArrayField):
                 field.parent_instance = self.instance
 
+    def _process_array_data(self, raw_data):
+        """ Returns a copy of raw_data in which the flattened array keys are replaced by one list per array field """
+        # read the array items from the original data, then copy only the keys which are kept; copying everything and
+        # deleting the array keys afterwards would traverse the data twice
+        array_keys, array_info = self._extract_array_info(raw_data)
+        array_keys = set(array_keys)
+        if isinstance(raw_data, QueryDict):
+            data = QueryDict(mutable=True, encoding=raw_data.encoding)
+            for key, values in raw_data.lists():
+                if key not in array_keys:
+                    data.setlist(key, list(values))
+        elif isinstance(raw_data, MultiValueDict):
+            data = MultiValueDict({key: list(values) for key, values in raw_data.lists() if key not in array_keys})
+        else:
+            data = {key: value for key, value in raw_data.items() if key not in array_keys}
+        for key, values in array_info.items():
+            data[key] = values
+        return data
+
     def _extract_array_info(self, raw_data):
         if not raw_data:
             return [], {}
         array_keys = []
         # iterate over raw data keys; if any are an array field, then process it
-        array_items_by_name_and_count = defaultdict(lambda: defaultdict(dict))
+        array_items_by_name_and_count = {}
         for key, value in raw_data.items():
             # array fields are named using the following pattern:
             # <array_form_field>.<item_count>.<form_field>
-            split_key = key.split('.') # extract pieces
-            if len(split_key) < 3:
+            # partition stops at the first dot, so no list of pieces is built for each key; anything after the second
+            # dot belongs to the form field name
+            array_field_name, sep, rest = key.partition('.')
+            if not sep:
+                # not an array field
+                continue
+            count, sep, field = rest.partition('.')
+            if not sep or not field:
                 # not an array field
                 continue
-            array_field_name = split_key[0]
-            count = split_key[1]
-            field = split_key[2]
-            array_items_by_name_and_count[array_field_name][count][field] = value
+            items_by_count = array_items_by_name_and_count.setdefault(array_field_name, {})
+            items_by_count.setdefault(count, {})[field] = value
             array_keys.append(key)
         # each array field should have its own list of objects
         array_field_data = {
-            array_field_name: values_by_count.values()
+            array_field_name: list(values_by_count.values())
             for array_field_name, values_by_count in array_items_by_name_and_count.items()
         }
         return array_keys, array_field_data
 
     def get_errors_for_template(self):
         return {
-            field_name: [e for e in errors] for field_name, errors in self.errors.items()
+            field_name: list(errors) for field_name, errors in self.errors.items()
         }
 
     def get_data_for_template(self):
         initial = {}
+        instance = self.instance
         for field_name, field in self.fields.items():
             if isinstance(field, SilicaSubFormArrayField):
                 field.refresh_data()
-            # first check instance
-            if self.instance and hasattr(self.instance, field_name) and not isinstance(field,
-                                                                                       SilicaSubFormArrayField):
-                initial[field_name] = getattr(self.instance, field_name)
+                initial[field_name] = field.initial
+                continue
+            # first check instance; a single getattr with a default replaces the hasattr + getattr pair, and still
+            # resolves descriptors such as foreign keys and properties which are not in the instance's __dict__
+            value = getattr(instance, field_name, _MISSING) if instance is not None else _MISSING
+            if value is not _MISSING:
+                initial[field_name] = value
             # TODO: figure out why this is an empty object for modelforms
             # elif field_name in self.initial:
             #     initial[field_name] = self.initial[field_name]
@@ -119,18 +162,35 @@ class SilicaFormMixin(JsonSchemaMixin, forms.Form):
         return initial
 
     def get_ui_schema(self):
+        if self._static_schema:
+            cls = type(self)
+            if cls._cached_ui_schema is None:
+                cls._cached_ui_schema = self._build_ui_schema()
+            schema = cls._cached_ui_schema
+            # as with get_data_schema, callers get their own outer dict and list of elements; the elements themselves
+            # are shared by every instance of the form class and must be treated as read-only
+            return {**schema, 'elements': list(schema['elements'])}
+        return self._build_ui_schema()
+
+    def _build_ui_schema(self):
         # this function is only ever called after the form has been instantiated, so we have access to self.fields
-        if hasattr(self.Meta, 'layout'):
-            return self.Meta.layout.get_ui_schema(self)
-        elements = []
-        for field_name, field in self.fields.items():
-            ui_kwargs = self._django_widget_to_ui_schema(field, field_config=self.get_field_config(field_name))
-            element = Control(field_name, **ui_kwargs)
-            elements.append(element)
-        return VerticalLayout(*elements).get_ui_schema(self)
+        if self._silica_layout is not None:
+            return self._silica_layout.get_ui_schema(self)
+        # each Control adds the widget and config ui schema of its field when rendered, so only the names are needed
+        return VerticalLayout(*self.fields).get_ui_schema(self)
 
     def get_data_schema(self):
         """ Schema is used by the frontend to validate rules """
+        if self._static_schema:
+            cls = type(self)
+            if cls._cached_data_schema is None:
+                cls._cached_data_schema = self._build_data_schema()
+            schema = cls._cached_data_schema
+            # callers may add properties (e.g. the identifier of an array item), so they get their own outer dicts
+            return {**schema, 'properties': dict(schema['properties'])}
+        return self._build_data_schema()
+
+    def _build_data_schema(self):
         # TODO: refine this to support more complex jsonschema rules and to (perhaps) simplify redundant rules
         # TODO: support error_message https://stackoverflow.com/questions/65303161/how-can-i-override-default-error-messages-text-in-json-forms
         properties = {
@@ -145,9 +205,9 @@ class SilicaFormMixin(JsonSchemaMixin, forms.Form):
     @property
     def custom_elements(self):
         """ Returns a list of CustomHTMLElement items in the form's Meta.layout """
-        if hasattr(self.Meta, 'layout'):
+        if self._silica_layout is not None:
             # we know that the top-level layout cannot be a custom html element, so we can just iterate through elements
-            return [e for e in self.Meta.layout.get_all_elements() if isinstance(e, CustomHTMLElement)]
+            return [e for e in self._silica_layout.get_all_elements() if isinstance(e, CustomHTMLElement)]
         return []
 
     def get_custom_elements_content(self):
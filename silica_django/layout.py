@@ -1,5 +1,7 @@
+import functools
 import random
 import string
+import weakref
 
 from silica_django.mixins import JsonSchemaMixin
 
@@ -14,145 +16,175 @@ class SilicaUiElementType:
     custom_element = "CustomHTMLElement"
 
 
+# alphabet for the generated ids of custom html elements
+_ID_CHARACTERS = string.ascii_lowercase
+
+
+@functools.lru_cache(maxsize=4096)
+def _build_scope(field_name):
+    # the same field names are laid out on every render of a form, so the scope strings are built once and reused.
+    # Field names are almost always lowercase identifiers already, in which case lower() would only copy the string.
+    if not field_name.islower():
+        field_name = field_name.lower()
+    return f'#/properties/{field_name}'
+
+
 class SilicaUiElement:
+    # layouts are declared once per form class but can hold many elements, so they do not need a __dict__ each
+    __slots__ = ('kwargs',)
     type = None
-    kwargs = None
-    field_name = None
 
     def __init__(self, *args, **kwargs):
-        if self.kwargs is None:
-            self.kwargs = {
-                **kwargs
-            }
+        self.kwargs = {
+            **kwargs
+        }
             
     def get_ui_schema(self, silica_form):
         raise NotImplemented
 
 
 class Control(SilicaUiElement, JsonSchemaMixin):
+    __slots__ = ('field_name',)
     type = SilicaUiElementType.control
 
     def __init__(self, field_name, scope=None, **kwargs):
         self.field_name = field_name
-        super().__init__(**kwargs)
         if scope is None:
-            scope = f'#/properties/{field_name.lower()}'
-        self.kwargs.update({
+            scope = _build_scope(field_name)
+        # explicitly passed kwargs take precedence over the generated values
+        super().__init__(**{
             'scope': scope,
             'type': self.type,
             'field_name': field_name,
+            **kwargs
         })
-        self.kwargs.update(kwargs)
 
     def get_ui_schema(self, silica_form):
+        field = silica_form.fields[self.field_name]
         field_config = silica_form.get_field_config(self.field_name)
-        if field_config:
-            if field_config.rule:
-                self.kwargs['rule'] = field_config.rule.get_rule_schema()
-            self.kwargs.update(self._django_widget_to_ui_schema(silica_form.fields[self.field_name], field_config=field_config))
-        else:
-            self.kwargs.update(self._django_widget_to_ui_schema(silica_form.fields[self.field_name]))
-        return self.kwargs
+        # each render builds a new dict, so that the declared kwargs never pick up values from a previous render
+        schema = dict(self.kwargs)
+        # the widget ui schema includes the rule of the field config, if there is one
+        schema.update(self._django_widget_to_ui_schema(field, field_config=field_config))
+        return schema
 
 
 class SilicaLayout(SilicaUiElement):
-    elements = None
     # because layouts are not named and therefore do not have a SilicaFieldConfig, css_classes and rule must be manually
     # set
-    rule = None
-    css_classes = None
+    __slots__ = ('elements', 'rule', 'css_classes', '_all_elements', '_schema_cache')
 
     def __init__(self, *args, rule=None, css_classes=None, **kwargs):
-        super().__init__(**kwargs)
+        # the layout type always takes precedence over the passed kwargs
+        super().__init__(**{**kwargs, 'type': self.type})
         self.rule = rule
         self.css_classes = css_classes
         # args should be a list of SilicaUiElements
         self.elements = [self._process_arg(a) for a in args]
-        self.kwargs.update({'type': self.type})
+        self._all_elements = None
+        # a (weak reference to a form, ui schema generated for it) pair. It is always replaced as a whole by a single
+        # assignment, so that a layout shared between threads can never pair one form with another form's schema.
+        self._schema_cache = None
 
     @staticmethod
     def _process_arg(arg):
         # if arg is a SilicaUiElement, we are recursing through a layout; if it is a string, we have to construct a Control
-        if type(arg) == str:
-            return Control(arg)
-        elif isinstance(arg, SilicaUiElement):
+        if isinstance(arg, SilicaUiElement):
             return arg
+        elif isinstance(arg, str):
+            return Control(arg)
         else:
             raise Exception(f"Unhandled type {type(arg)}")
 
     def get_all_elements(self):
         """ Returns all LayoutElements in a flat array; for use when nesting is not important, e.g. setting up mappings """
+        # a layout does not change once it is constructed, so the tree only needs to be walked once
+        if self._all_elements is not None:
+            return self._all_elements
         elems = []
-        for item in self.elements:
+        # walk the tree with an explicit stack rather than recursing into (and copying the results of) each sub-layout;
+        # children are pushed in reverse so that elements come out in document order
+        stack = self.elements[::-1]
+        while stack:
+            item = stack.pop()
             if isinstance(item, SilicaLayout):
-                elems.extend(item.get_all_elements())
+                stack.extend(reversed(item.elements))
             elif isinstance(item, SilicaUiElement):
                 elems.append(item)
             else:
                 raise Exception(f"Unsupported element {item}")
+        self._all_elements = elems
         return elems
 
     def get_ui_schema(self, silica_form):
-        schema = self.kwargs
+        # rendering the same form again (e.g. a template asking for the schema more than once) reuses the whole tree
+        # rather than walking every element; a weak reference is kept so that the layout never keeps a form alive
+        schema_cache = self._schema_cache
+        if schema_cache is not None and schema_cache[0]() is silica_form:
+            return schema_cache[1]
+        # each render builds a new dict, so that the declared kwargs never pick up values from a previous render
+        schema = dict(self.kwargs)
         # flatten elements
         schema['elements'] = [element.get_ui_schema(silica_form) for element in self.elements]
         if self.css_classes:
             schema['options'] = {'overrideCss': self.css_classes}
         if self.rule:
             schema['rule'] = self.rule.get_rule_schema()
+        self._schema_cache = (weakref.ref(silica_form), schema)
         return schema
 
 
 class HorizontalLayout(SilicaLayout):
+    __slots__ = ()
     type = SilicaUiElementType.horizontal
 
 
 class VerticalLayout(SilicaLayout):
+    __slots__ = ()
     type = SilicaUiElementType.vertical
 
 
 class Group(SilicaLayout):
+    __slots__ = ()
     type = SilicaUiElementType.group
 
     def __init__(self, label, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.kwargs.update({'label': label})
+        super().__init__(*args, label=label, **kwargs)
 
 
 class Categorization(SilicaLayout):
+    __slots__ = ()
     type = SilicaUiElementType.categorization
 
     def get_ui_schema(self, silica_form):
-        if any([e.type != SilicaUiElementType.category for e in self.elements]):
+        category = SilicaUiElementType.category
+        if any(e.type != category for e in self.elements):
             raise Exception("Categorization elements may not have any non-Category direct children.")
         return super().get_ui_schema(silica_form)
 
 
 class Category(SilicaLayout):
+    __slots__ = ()
     type = SilicaUiElementType.category
-    label = None
 
     def __init__(self, label, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.kwargs.update({'label': label})
+        super().__init__(*args, label=label, **kwargs)
 
 
 class CustomHTMLElement(SilicaUiElement):
+    __slots__ = ('content', 'rule', '_id')
     type = SilicaUiElementType.custom_element
-    content = None
-    rule = None
-    _id = None
-
-    def __init__(self, content, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        letters = string.ascii_lowercase
-        self._id = ''.join(random.choice(letters) for _ in range(10))
-        self.kwargs.update({
+
+    def __init__(self, content, *args, rule=None, **kwargs):
+        self._id = ''.join(random.choices(_ID_CHARACTERS, k=10))
+        # explicitly passed kwargs take precedence over the generated values
+        super().__init__(*args, **{
             'name': self._id,
             'type': self.type,
-            'scope': '#/'
+            'scope': '#/',
+            **kwargs
         })
-        self.kwargs.update(kwargs)
+        self.rule = rule
         self.content = content
 
     def get_mapped_content(self):
@@ -160,7 +192,7 @@ class CustomHTMLElement(SilicaUiElement):
         return {self._id: self.content}
 
     def get_ui_schema(self, silica_form):
-        schema = self.kwargs
+        schema = dict(self.kwargs)
         if self.rule:
             schema['rule'] = self.rule.get_rule_schema()
         return schema
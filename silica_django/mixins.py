@@ -1,3 +1,5 @@
+import functools
+
 from django import forms
 
 from silica_django import fields
@@ -6,45 +8,69 @@ from silica_django.utils.jsonschema import JsonSchemaUtils
 from silica_django.widgets import SilicaRenderer
 
 
+# jsonschema (type, format) of each form field class that is not simply a string
+_FIELD_SCHEMA_TYPES = {
+    forms.DateField: ("string", "date"),
+    forms.DateTimeField: ("string", "date-time"),
+    forms.TimeField: ("string", "time"),
+    forms.IntegerField: ("integer", None),
+    forms.FloatField: ("number", None),
+    forms.DecimalField: ("number", None),
+    forms.BooleanField: ("boolean", None),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _jsonschema_type_for(field_class):
+    """ Resolves a form field class to its jsonschema (type, format), using the most specific match in its MRO """
+    for cls in field_class.__mro__:
+        schema_type = _FIELD_SCHEMA_TYPES.get(cls)
+        if schema_type is not None:
+            return schema_type
+    # most field types are string by default
+    return "string", None
+
+
+# ui schema options implied by each widget class
+_WIDGET_UI_OPTIONS = {
+    forms.Textarea: {'multi': True},
+    forms.RadioSelect: {'format': "radio"},
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _ui_options_for(widget_class):
+    """ Resolves a widget class to the ui schema options of every matching class in its MRO """
+    options = {}
+    for cls in reversed(widget_class.__mro__):
+        options.update(_WIDGET_UI_OPTIONS.get(cls, ()))
+    return options
+
+
 class JsonSchemaMixin(JsonSchemaUtils):
     """ Contains utility functions for interfacing between native python/django and jsonschema """
+    __slots__ = ()
+
     def _django_to_jsonschema_field(self, field_name, field, field_config=None):
-        # most field types are string by default
-        field_type = "string"
-        # format is only required for some special types e.g. date
         field_kwargs = {
             'name': field_name,
             'options': {}
         }
-        if isinstance(field, forms.DateField):
-            field_kwargs["format"] = "date"
-        elif isinstance(field, forms.DateTimeField):
-            field_kwargs["format"] = "date-time"
-        elif isinstance(field, forms.TimeField):
-            field_kwargs["format"] = "time"
-        elif isinstance(field, forms.IntegerField):
-            field_type = "integer"
-        elif isinstance(field, forms.FloatField) or isinstance(field, forms.DecimalField):
-            field_type = "number"
-        elif isinstance(field, forms.BooleanField):
-            field_type = "boolean"
         # todo: differentiate between arrays of related items and a multi field (e.g. tags)
-        elif isinstance(field, fields.SilicaSubFormArrayField):
+        if isinstance(field, fields.SilicaSubFormArrayField):
             field_type = "array"
-            if field._instantiated_forms:
-                item_schema = field._instantiated_forms[0].get_data_schema()
-            else:
-                # there are no existing sub-items, instantiate the form to get the schema
-                item_schema = field._instantiate_form().get_data_schema()
-            item_schema["properties"][field.identifier_field] = {
-                    "type": "number",
-                    "hidden": True
-                }
             field_kwargs['items'] = {
-                **item_schema,
+                **field.get_item_schema(),
             }
-        if hasattr(field, 'choices'):
-            field_kwargs["oneOf"] = [{'const': value, 'title': title} for (value, title) in field.choices]
+        else:
+            # format is only required for some special types e.g. date
+            field_type, field_format = _jsonschema_type_for(type(field))
+            if field_format:
+                field_kwargs["format"] = field_format
+        # choices are read once; for a ModelChoiceField every access builds a new iterator over the queryset
+        choices = getattr(field, 'choices', None)
+        if choices is not None:
+            field_kwargs["oneOf"] = [{'const': value, 'title': title} for (value, title) in choices]
         # special checks
         if isinstance(field.widget, forms.HiddenInput):
             field_kwargs['hidden'] = True
@@ -53,7 +79,7 @@ class JsonSchemaMixin(JsonSchemaUtils):
         if isinstance(field.widget, forms.RadioSelect):
             # for a radio select, everything is a string - we'll convert on the backend
             field_type = "string"
-            if not hasattr(field, 'choices'):
+            if choices is None:
                 field_kwargs["oneOf"] = [{'const': str(value), 'title': title} for (value, title) in field.widget.choices]
         if field_config:
             if field_config.schema:
@@ -75,27 +101,28 @@ class JsonSchemaMixin(JsonSchemaUtils):
         }
 
     def _django_widget_to_ui_schema(self, field, field_config=None):
+        widget = field.widget
+        # special values for widgets; the cached options are copied as they are updated below
         ui_schema = {
-            'options': {}
+            'options': {**_ui_options_for(type(widget))}
         }
         if field.label:
             ui_schema['label'] = field.label
         if field.disabled:
             ui_schema['readonly'] = True
-        # special values for widgets
-        if isinstance(field.widget, forms.Textarea):
-            ui_schema['options']['multi'] = True
-        if isinstance(field.widget, SilicaRenderer):
-            ui_schema['options']['customComponentName'] = field.widget.custom_component_name
-        if isinstance(field.widget, forms.RadioSelect):
-            ui_schema['options']['format'] = "radio"
+        # the component name is set per widget instance, so it cannot come from the class lookup
+        if isinstance(widget, SilicaRenderer):
+            ui_schema['options']['customComponentName'] = widget.custom_component_name
         # add rules and update uischema
         if field_config:
             if field_config.rule:
                 ui_schema['rule'] = field_config.rule.get_rule_schema()
-            if field_config.uischema:
-                ui_opts = ui_schema['options']
-                ui_opts.update(field_config.uischema['options'])
-                ui_schema.update(field_config.uischema)
-                ui_schema['options'] = ui_opts
+            uischema = field_config.uischema
+            if uischema:
+                # configured values override generated ones, except that the options of both are merged
+                ui_schema = {
+                    **ui_schema,
+                    **uischema,
+                    'options': {**ui_schema['options'], **uischema['options']},
+                }
         return ui_schema
@@ -22,23 +22,33 @@ class Condition(JsonSchemaUtils):
 
     """
 
-    args = None
+    __slots__ = ('args', 'kwargs')
     schema_key = None
-    kwargs = None
 
     def __init__(self, *args, **kwargs):
         self.args = args
         self.kwargs = kwargs
 
     def get_condition_schema(self):
-        schema = []
-        if self.args:
-            schema = self._process_args()
+        # nested conditions are walked with an explicit stack rather than by recursion; each pending entry is a
+        # condition along with the (empty) dict its schema should be written into
+        schema = {}
+        pending = [(schema, self)]
+        while pending:
+            target, condition = pending.pop()
+            condition._build_condition_schema(target, pending)
+        return schema
+
+    def _build_condition_schema(self, schema, pending):
+        # the schemas of args are filled in later, but their place in the list is reserved now to keep them in order
+        conditions = []
+        for arg in self.args:
+            arg_schema = {}
+            conditions.append(arg_schema)
+            pending.append((arg_schema, arg))
         if self.kwargs:
-            schema.append(self._process_kwargs())
-        return {
-            self.schema_key: schema
-        }
+            conditions.append(self._process_kwargs())
+        schema[self.schema_key] = conditions
 
     def _process_kwargs(self):
         # kwargs are direct assignments of keys to values, so we can just return a dictionary
@@ -47,60 +57,64 @@ class Condition(JsonSchemaUtils):
             "properties": {key: self.value_as_jsonschema(val) for key, val in self.kwargs.items()}
         }
 
-    def _process_args(self):
-        # args can only be other conditions
-        return [
-            arg.get_condition_schema() for arg in self.args
-        ]
-
 
 class Or(Condition):
+    __slots__ = ()
     schema_key = "anyOf"
 
 
 class And(Condition):
+    __slots__ = ()
     schema_key = "allOf"
 
 
 class Not(Condition):
+    __slots__ = ()
     schema_key = "not"
 
-    def get_condition_schema(self):
-        # the Not JsonSchema object has to be specially formatted
-        schema = {}
+    def _build_condition_schema(self, schema, pending):
+        # the Not JsonSchema object has to be specially formatted: kwargs and args are all merged into a single object
+        not_schema = {}
         if self.kwargs:
-            schema.update({
-                **self._process_kwargs(),
-            })
-        for arg in self.args:
-            schema.update(**arg.get_condition_schema())
-        return {
-            self.schema_key: schema
-        }
+            not_schema.update(self._process_kwargs())
+        # args write into the same object, so they are pushed in reverse to be applied in order (later args win)
+        for arg in reversed(self.args):
+            pending.append((not_schema, arg))
+        schema[self.schema_key] = not_schema
 
 
 class Rule(JsonSchemaUtils):
     """
         Rules take in any number of conditions as args; any kwargs are treated as a single And, i.e. And(**kwargs)
 
-        In order to support this behavior, all conditions are wrapped in an Or.
+        In order to support this behavior, multiple conditions are wrapped in an Or; a single condition is used as is.
     """
-    args = None
+    __slots__ = ('args', 'kwargs', '_rule_schema')
     effect = None
     custom_schema = None
-    kwargs = None
 
     def __init__(self, *args, **kwargs):
         self.args = args
         self.kwargs = kwargs
+        self._rule_schema = None
 
     def get_rule_schema(self):
+        # rules are declared once on the form's Meta and do not change, so the schema is only built once
+        if self._rule_schema is None:
+            self._rule_schema = self._build_rule_schema()
+        return self._rule_schema
+
+    def _build_rule_schema(self):
         schema_args = []
         if len(self.args):
             schema_args += list(self.args)
         if len(self.kwargs):
             schema_args.append(And(**self.kwargs))
-        schema = Or(*schema_args).get_condition_schema()
+        if len(schema_args) == 1:
+            # an anyOf with a single member is equivalent to the member itself, so skip the wrapper
+            schema = schema_args[0].get_condition_schema()
+        else:
+            schema = Or(*schema_args).get_condition_schema()
         return {
             "effect": self.effect,
             "condition": {
@@ -111,16 +125,20 @@ class Rule(JsonSchemaUtils):
 
 
 class ShowIf(Rule):
+    __slots__ = ()
     effect = UIEffects.show
 
 
 class HideIf(Rule):
+    __slots__ = ()
     effect = UIEffects.hide
 
 
 class DisableIf(Rule):
+    __slots__ = ()
     effect = UIEffects.disable
 
 
 class EnableIf(Rule):
+    __slots__ = ()
     effect = UIEffects.enable
@@ -1,15 +1,25 @@
+import functools
+
 from django import template
 
 register = template.Library()
 
 
-@register.inclusion_tag('silica_loader.html')
-def load_silica_form(form, form_id):
+@functools.lru_cache(maxsize=256)
+def _get_template_keys(form_id):
+    # form ids are usually constant per template, so the element ids are only built once per form id
     return {
-        "form": form,
         "form_data_key": form_id + "-data",
         "form_schema_key": form_id + "-schema",
         "form_ui_schema_key": form_id + "-ui-schema",
         "form_errors_key": form_id + "-errors",
         "custom_elements_key": form_id + "-custom-elements",
     }
+
+
+@register.inclusion_tag('silica_loader.html')
+def load_silica_form(form, form_id):
+    return {
+        "form": form,
+        **_get_template_keys(form_id),
+    }
@@ -1,198 +1,354 @@
 import unittest
+import uuid
+
+import django
+from django import forms
+from django.conf import settings
+
+if not settings.configured:
+    # the suite is run directly rather than through a project, so it provides the minimal settings it needs
+    settings.configure(
+        INSTALLED_APPS=['django.contrib.contenttypes', 'silica_django'],
+        DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+        DEFAULT_AUTO_FIELD='django.db.models.AutoField',
+    )
+    django.setup()
+
+from django.db import connection, models
+from django.http import QueryDict
+from django.test import TestCase
+from django.utils.datastructures import MultiValueDict
 
 from silica_django.config import SilicaConfig, SilicaFieldConfig
+from silica_django.fields import SilicaSubFormArrayField
+from silica_django.forms import SilicaModelFormMixin, _has_array_keys
+from silica_django.layout import VerticalLayout
+from silica_django.mixins import JsonSchemaMixin
 from silica_django.utils.jsonschema import JsonSchemaUtils
 
 from silica_django.rules import Or, And, Not, ShowIf
 
 
+class Parent(models.Model):
+    name = models.CharField(max_length=20)
+
+    class Meta:
+        app_label = 'silica_django'
+
+
+class Child(models.Model):
+    parent = models.ForeignKey(Parent, null=True, blank=True, on_delete=models.CASCADE)
+    title = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+    kind = models.CharField(max_length=1, choices=[('a', 'A'), ('b', 'B')], default='a')
+
+    class Meta:
+        app_label = 'silica_django'
+
+
+class UUIDChild(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    title = models.CharField(max_length=20)
+
+    class Meta:
+        app_label = 'silica_django'
+
+
+class Item(models.Model):
+    title = models.CharField(max_length=20)
+
+    class Meta:
+        app_label = 'silica_django'
+
+
+class InheritedItem(Item):
+    note = models.CharField(max_length=20, blank=True)
+
+    class Meta:
+        app_label = 'silica_django'
+
+
+TEST_MODELS = [Parent, Child, UUIDChild, Item, InheritedItem]
+
+
+def setUpModule():
+    with connection.schema_editor() as schema_editor:
+        for model in TEST_MODELS:
+            schema_editor.create_model(model)
+
+
+def tearDownModule():
+    with connection.schema_editor() as schema_editor:
+        for model in reversed(TEST_MODELS):
+            schema_editor.delete_model(model)
+
+
+class ChildForm(SilicaModelFormMixin):
+    class Meta:
+        model = Child
+        fields = ['title', 'count']
+
+
+class ChildrenField(SilicaSubFormArrayField):
+    instance_form = ChildForm
+
+
+class DetailedChildForm(SilicaModelFormMixin):
+    class Meta:
+        model = Child
+        fields = ['title', 'count', 'kind', 'parent']
+
+
+class UnchangedChildrenField(SilicaSubFormArrayField):
+    instance_form = DetailedChildForm
+    skip_unchanged = True
+
+
+class SkipUnchangedParentForm(SilicaModelFormMixin):
+    children = UnchangedChildrenField(required=False)
+
+    class Meta:
+        model = Parent
+        fields = ['name']
+
+
+class TitleOnlyChildForm(SilicaModelFormMixin):
+    class Meta:
+        model = Child
+        fields = ['title']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # a field which is only added once the form is instantiated, so it is missing from base_fields
+        if self.parent_instance is not None:
+            self.fields['count'] = forms.IntegerField()
+
+
+class TitleOnlyChildrenField(SilicaSubFormArrayField):
+    instance_form = TitleOnlyChildForm
+    skip_unchanged = True
+
+
+class TitleOnlyParentForm(SilicaModelFormMixin):
+    children = TitleOnlyChildrenField(required=False)
+
+    class Meta:
+        model = Parent
+        fields = ['name']
+
+
+class UUIDChildForm(SilicaModelFormMixin):
+    class Meta:
+        model = UUIDChild
+        fields = ['title']
+
+
+class UUIDChildrenField(SilicaSubFormArrayField):
+    instance_form = UUIDChildForm
+
+
+class UUIDParentForm(SilicaModelFormMixin):
+    children = UUIDChildrenField(required=False)
+
+    class Meta:
+        model = Parent
+        fields = ['name']
+
+
+class ParentForm(SilicaModelFormMixin):
+    # no queryset is given, so the field falls back to every Child
+    children = ChildrenField(required=False)
+
+    class Meta:
+        model = Parent
+        fields = ['name']
+
+
+class PrefetchChildrenField(ChildrenField):
+    # parent is not a field of the item form
+    prefetch_related = ('parent',)
+
+
+class PrefetchParentForm(SilicaModelFormMixin):
+    children = PrefetchChildrenField(required=False)
+
+    class Meta:
+        model = Parent
+        fields = ['name']
+
+
+class UpsertChildrenField(ChildrenField):
+    use_upsert = True
+
+
+class UpsertParentForm(SilicaModelFormMixin):
+    children = UpsertChildrenField(required=False)
+
+    class Meta:
+        model = Parent
+        fields = ['name']
+
+
+class InheritedItemForm(SilicaModelFormMixin):
+    class Meta:
+        model = InheritedItem
+        fields = ['title', 'note']
+
+
+class InheritedItemsField(SilicaSubFormArrayField):
+    instance_form = InheritedItemForm
+    use_upsert = True
+
+
+class InheritedItemParentForm(SilicaModelFormMixin):
+    items = InheritedItemsField(required=False)
+
+    class Meta:
+        model = Parent
+        fields = ['name']
+
+
 class BaseTestCase(unittest.TestCase):
     # set maximum number of characters which will be printed for a single diff
     maxDiff = 10000
 
-    def assertEqualAsStrings(self, first, second, msg=None):
-        """ Converts arguments to strings before comparing them; helps with legibility when reading printout from 
-        comparing heavily nested objects """
-        return self.assertEqual(str(first), str(second), msg=msg)
+    def assertSchemaEqual(self, first, second, msg=None):
+        """ Compares generated schemas; dicts are compared with assertDictEqual, which prints a readable diff of the
+        nested objects on failure """
+        return self.assertEqual(first, second, msg=msg)
 
 
-class TestConditions(BaseTestCase):
-    def test_or_single_key_single_value(self):
-        or_1 = Or(key1=1)
-        self.assertEqualAsStrings(or_1.get_condition_schema(), {
-            "anyOf": [
-                {"type": "object", "properties": {"key1": {"const": 1}}}
-            ]
-        })
+def const(value):
+    return {"const": value}
 
-    def test_or_single_key_multiple_values(self):
-        or_1 = Or(key1=[1, 2, 3])
-        self.assertEqualAsStrings(or_1.get_condition_schema(), {
-            "anyOf": [
-                {"type": "object",
-                 "properties": {"key1": {"enum": [1, 2, 3]}}}
-            ]
-        })
 
-    def test_or_multiple_keys(self):
-        or_1 = Or(key1=1, key2=[1, 2, 3])
-        self.assertEqualAsStrings(or_1.get_condition_schema(), {
-            "anyOf": [
-                {
-                    "type": "object",
-                    "properties": {"key1": {"const": 1}, "key2": {"enum": [1, 2, 3]}}
-                }
-            ]
-        })
+def enum(*values):
+    return {"enum": list(values)}
 
-    def test_and_multiple_keys(self):
-        and_1 = And(key1=1, key2=2)
-        self.assertEqualAsStrings(and_1.get_condition_schema(), {
-            "allOf": [
-                {
-                    "type": "object",
-                    "properties": {
-                        "key1": {"const": 1},
-                        "key2": {"const": 2}
-                    }
-                }
-            ]
-        })
+
+def obj(**properties):
+    """ The schema generated for the kwargs of a condition """
+    return {"type": "object", "properties": properties}
+
+
+OR_CASES = [
+    (Or(key1=1), {"anyOf": [obj(key1=const(1))]}),
+    (Or(key1=[1, 2, 3]), {"anyOf": [obj(key1=enum(1, 2, 3))]}),
+    (Or(key1=1, key2=[1, 2, 3]), {"anyOf": [obj(key1=const(1), key2=enum(1, 2, 3))]}),
+]
+
+AND_CASES = [
+    (And(key1=1, key2=2), {"allOf": [obj(key1=const(1), key2=const(2))]}),
+    (And(Or(Not(key1=1), key2=2), key3=3), {
+        "allOf": [
+            {"anyOf": [{"not": obj(key1=const(1))}, obj(key2=const(2))]},
+            obj(key3=const(3)),
+        ]
+    }),
+]
+
+NOT_CASES = [
+    (Not(key1=1), {"not": obj(key1=const(1))}),
+    (Not(Or(key1=1, key2=1)), {"not": {"anyOf": [obj(key1=const(1), key2=const(1))]}}),
+]
+
+
+class TestConditions(BaseTestCase):
+    def assertConditionSchemas(self, cases):
+        for index, (condition, expected) in enumerate(cases):
+            with self.subTest(index=index):
+                self.assertSchemaEqual(condition.get_condition_schema(), expected)
+
+    def test_or(self):
+        self.assertConditionSchemas(OR_CASES)
+
+    def test_and(self):
+        self.assertConditionSchemas(AND_CASES)
 
     def test_not(self):
-        not_1 = Not(key1=1)
-        self.assertEqualAsStrings(not_1.get_condition_schema(), {
-            'not': {
-                'type': 'object',
-                'properties':
-                    {
-                        'key1': {'const': 1}
-                    }
-            }
-        })
+        self.assertConditionSchemas(NOT_CASES)
 
-    def test_not_composable(self):
-        not_1 = Not(Or(key1=1, key2=1))
-        self.assertEqualAsStrings(not_1.get_condition_schema(), {
-            'not': {
-                'anyOf': [
-                    {
-                        'type': 'object',
-                        'properties': {
-                            'key1': {'const': 1},
-                            'key2': {'const': 1},
-                        }
-                    }
-                ]
-            }
-        })
+
+# the expected schemas are those of each rule's condition
+SHOW_IF_CASES = [
+    # only kwargs
+    (ShowIf(key1=1), {"allOf": [obj(key1=const(1))]}),
+    # a single arg
+    (ShowIf(Or(key1=1, key2=1)), {"anyOf": [obj(key1=const(1), key2=const(1))]}),
+    # only args
+    (ShowIf(Or(key1=1, key2=1), And(key1=2, key2=3)), {
+        "anyOf": [
+            {"anyOf": [obj(key1=const(1), key2=const(1))]},
+            {"allOf": [obj(key1=const(2), key2=const(3))]},
+        ]
+    }),
+    # args and kwargs
+    (ShowIf(And(key2=2, key3=3), key1=1), {
+        "anyOf": [
+            {"allOf": [obj(key2=const(2), key3=const(3))]},
+            {"allOf": [obj(key1=const(1))]},
+        ]
+    }),
+]
 
 
 class TestRules(BaseTestCase):
-    def test_show_only_kwargs(self):
-        rule = ShowIf(key1=1)
-        self.assertEqualAsStrings(rule.get_rule_schema(), {
-            "effect": rule.effect,
-            "condition": {
-                "scope": "#",
-                "schema": {
-                    "anyOf": [
-                        {
-                            "allOf": [
-                                {
-                                    "type": "object",
-                                    "properties": {
-                                        "key1": {"const": 1}
-                                    }
-                                }
-                            ]
-                        }
-                    ]
-                }
-            }
-        })
+    def test_show_if(self):
+        for index, (rule, condition_schema) in enumerate(SHOW_IF_CASES):
+            with self.subTest(index=index):
+                self.assertSchemaEqual(rule.get_rule_schema(), {
+                    "effect": rule.effect,
+                    "condition": {
+                        "scope": "#",
+                        "schema": condition_schema
+                    }
+                })
 
-    def test_show_only_args(self):
-        rule = ShowIf(Or(key1=1, key2=1), And(key1=2, key2=3))
-        self.assertEqualAsStrings(rule.get_rule_schema(), {
-            "effect": rule.effect,
-            "condition": {
-                "scope": "#",
-                "schema": {
-                    "anyOf": [
-                        {
-                            "anyOf": [
-                                {
-                                    "type": "object",
-                                    "properties": {
-                                        "key1": {"const": 1},
-                                        "key2": {"const": 1},
-                                    }
-                                }
-                            ]
-                        },
-                        {
-                            "allOf": [
-                                {
-                                    "type": "object",
-                                    "properties": {
-                                        "key1": {"const": 2},
-                                        "key2": {"const": 3},
-                                    }
-                                }
-                            ]
-                        }
-                    ]
-                }
-            }
-        })
+    def test_schema_is_built_once(self):
+        rule = ShowIf(Or(key1=1), key2=2)
+        self.assertIs(rule.get_rule_schema(), rule.get_rule_schema())
 
-    def test_show_args_and_kwargs(self):
-        rule = ShowIf(And(key2=2, key3=3), key1=1)
-        self.assertEqualAsStrings(rule.get_rule_schema(), {
-            "effect": rule.effect,
-            "condition": {
-                "scope": "#",
-                "schema": {
-                    "anyOf": [
-                        {
-                            "allOf": [
-                                {
-                                    "type": "object",
-                                    "properties": {
-                                        "key2": {"const": 2},
-                                        "key3": {"const": 3},
-                                    }
-                                }
-                            ]
-                        },
-                        {
-                            "allOf": [
-                                {
-                                    "type": "object",
-                                    "properties": {
-                                        "key1": {"const": 1}
-                                    }
-                                }
-                            ]
-                        },
-                    ]
-                }
-            }
-        })
+
+class PercentageField(forms.FloatField):
+    pass
 
 
 class TestJsonSchemaTranslation(BaseTestCase):
+    def assertFieldType(self, field, expected_type, expected_format=None):
+        schema = JsonSchemaMixin()._django_to_jsonschema_field('field', field)
+        self.assertEqual((schema['type'], schema.get('format')), (expected_type, expected_format))
+
+    def test_field_types(self):
+        self.assertFieldType(forms.CharField(), "string")
+        self.assertFieldType(forms.EmailField(), "string")
+        self.assertFieldType(forms.ChoiceField(), "string")
+        self.assertFieldType(forms.DateField(), "string", "date")
+        self.assertFieldType(forms.DateTimeField(), "string", "date-time")
+        self.assertFieldType(forms.TimeField(), "string", "time")
+        self.assertFieldType(forms.IntegerField(), "integer")
+        self.assertFieldType(forms.BooleanField(), "boolean")
+        self.assertFieldType(forms.NullBooleanField(), "boolean")
+
+    def test_number_field_types(self):
+        # FloatField and DecimalField subclass IntegerField, but the most specific class decides the type
+        self.assertFieldType(forms.FloatField(), "number")
+        self.assertFieldType(forms.DecimalField(), "number")
+        self.assertFieldType(PercentageField(), "number")
 
     def test_value_as_jsonschema(self):
-        self.assertEqualAsStrings(JsonSchemaUtils.value_as_jsonschema(1), {"const": 1})
-        self.assertEqualAsStrings(JsonSchemaUtils.value_as_jsonschema([1]), {"enum": [1]})
+        self.assertSchemaEqual(JsonSchemaUtils.value_as_jsonschema(1), {"const": 1})
+        self.assertSchemaEqual(JsonSchemaUtils.value_as_jsonschema([1]), {"enum": [1]})
+        self.assertSchemaEqual(JsonSchemaUtils.value_as_jsonschema((1, 2)), {"enum": [1, 2]})
+        self.assertSchemaEqual(JsonSchemaUtils.value_as_jsonschema({1}), {"enum": [1]})
+        self.assertSchemaEqual(JsonSchemaUtils.value_as_jsonschema("1"), {"const": "1"})
 
 
 class TestSilicaConfig(BaseTestCase):
-    def assertKwargsCorrectlyProcessed(self):
-        """ Assert that the kwargs passed to the SilicaConfig are properly formatted internally """
-        config = SilicaConfig(
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # the config is only ever read, so a single instance is shared by every check in this class
+        cls.config = SilicaConfig(
             field1=SilicaFieldConfig(
                 maximum=1,
                 minimum=2,
@@ -202,32 +358,325 @@ class TestSilicaConfig(BaseTestCase):
                 description="a description",
                 type="object",
                 schema_format="int",
-                required=["field2"],
-                additional_properties=True,
                 label="oh yeah",
             )
         )
-        
-        
-        return True
-    
-    def assertUISchemaCustomize(self):
-        return True
-    
-    def assertUISchemaOverride(self):
-        return True
-    
-    def assertSchemaCustomize(self):
-        return True
-    
-    def assertSchemaOverride(self):
-        return True
-    
-    def assertRule(self):
-        return True
-    
-    def assertComplexUISchema(self):
-        return True
+
+    def test_kwargs_correctly_processed(self):
+        """ The kwargs passed to the SilicaConfig are formatted internally as jsonschema expects """
+        field_config = self.config.get_field_config('field1')
+        self.assertEqual(field_config.schema, {
+            'maximum': 1,
+            'minimum': 2,
+            'default': 2,
+            'minLength': 1,
+            'maxLength': 3,
+            'description': 'a description',
+            'type': 'object',
+            'format': 'int',
+        })
+        self.assertEqual(field_config.uischema, {'label': 'oh yeah', 'options': {}})
+        self.assertIsNone(self.config.get_field_config('field2'))
+
+    def test_ui_schema_customize(self):
+        field_config = SilicaFieldConfig(detail='GENERATED', ui_options={'custom': 1})
+        self.assertEqual(field_config.uischema, {'options': {'detail': 'GENERATED', 'custom': 1}})
+
+    def test_ui_schema_override(self):
+        field_config = SilicaFieldConfig(detail='GENERATED', ui_format='radio', ui_options={'detail': 'REGISTERED', 'format': None})
+        self.assertEqual(field_config.uischema, {'options': {'detail': 'REGISTERED'}})
+
+    def test_schema_customize(self):
+        schema = JsonSchemaMixin()._django_to_jsonschema_field('field', forms.IntegerField(), self.config.get_field_config('field1'))
+        self.assertEqual(schema['maximum'], 1)
+        self.assertEqual(schema['description'], 'a description')
+
+    def test_schema_override(self):
+        field_config = SilicaFieldConfig(type='number', schema_format='float')
+        schema = JsonSchemaMixin()._django_to_jsonschema_field('field', forms.DateField(), field_config)
+        self.assertEqual((schema['type'], schema['format']), ('number', 'float'))
+
+    def test_rule(self):
+        rule = ShowIf(key1=1)
+        ui_schema = JsonSchemaMixin()._django_widget_to_ui_schema(forms.CharField(), SilicaFieldConfig(rule=rule))
+        self.assertEqual(ui_schema['rule'], rule.get_rule_schema())
+
+    def test_complex_ui_schema(self):
+        field = forms.CharField(label='generated', widget=forms.Textarea)
+        field_config = SilicaFieldConfig(label='configured', readonly=True)
+        ui_schema = JsonSchemaMixin()._django_widget_to_ui_schema(field, field_config)
+        # the configured label wins, while the widget's options are merged with the configured ones
+        self.assertEqual(ui_schema, {'label': 'configured', 'options': {'multi': True, 'readOnly': True}})
+
+
+class TestSubFormArrayField(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = Parent.objects.create(name='parent')
+        cls.child = Child.objects.create(parent=cls.parent, title='child', count=1)
+
+    def test_update_without_queryset(self):
+        # submitted identifiers are strings, and the field has not evaluated its queryset before validating
+        form = ParentForm({
+            'name': 'parent',
+            'children.0.pk': str(self.child.pk),
+            'children.0.title': 'renamed',
+            'children.0.count': '1',
+        }, instance=self.parent)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(Child.objects.get(pk=self.child.pk).title, 'renamed')
+
+    def test_create_update_and_delete(self):
+        # left out of the submitted data, so it is deleted
+        Child.objects.create(parent=self.parent, title='removed', count=2)
+        form = ParentForm({
+            'name': 'parent',
+            'children.0.pk': str(self.child.pk),
+            'children.0.title': 'renamed',
+            'children.0.count': '1',
+            'children.1.pk': '',
+            'children.1.title': 'created',
+            'children.1.count': '3',
+        }, instance=self.parent)
+        # validation evaluates the queryset once, however many rows are submitted
+        with self.assertNumQueries(1):
+            self.assertTrue(form.is_valid(), form.errors)
+        # the parent UPDATE; the SAVEPOINT and RELEASE of the array save's atomic block (a savepoint, as each test runs
+        # in a transaction); within it the locking SELECT, one DELETE, one UPDATE and one INSERT; then the SELECT which
+        # refreshes the field
+        with self.assertNumQueries(8):
+            form.save()
+        self.assertEqual(Child.objects.get(pk=self.child.pk).title, 'renamed')
+        self.assertEqual(
+            sorted(Child.objects.values_list('title', 'count')),
+            [('created', 3), ('renamed', 1)]
+        )
+
+    def test_prefetch_does_not_query_per_row(self):
+        Child.objects.bulk_create(Child(parent=self.parent, title=f'child {i}') for i in range(4))
+        data = {'name': 'parent'}
+        for i, child in enumerate(Child.objects.all()):
+            data.update({f'children.{i}.pk': str(child.pk), f'children.{i}.title': 'renamed', f'children.{i}.count': '1'})
+        form = PrefetchParentForm(data, instance=self.parent)
+        # the rows and the prefetched parents, rather than one more query per row for the deferred parent_id
+        with self.assertNumQueries(2):
+            self.assertTrue(form.is_valid(), form.errors)
+
+    def test_array_field_removed_after_init(self):
+        class RestrictedParentForm(ParentForm):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                del self.fields['children']
+
+        form = RestrictedParentForm({'name': 'renamed'}, instance=self.parent)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertNotIn('children', form.get_data_for_template())
+        self.assertEqual(Parent.objects.get(pk=self.parent.pk).name, 'renamed')
+        self.assertTrue(Child.objects.filter(pk=self.child.pk).exists())
+
+    def test_non_canonical_identifier_is_not_deleted(self):
+        child = UUIDChild.objects.create(title='child')
+        form = UUIDParentForm({
+            'name': 'parent',
+            'children.0.pk': child.pk.hex.upper(),
+            'children.0.title': 'renamed',
+        }, instance=self.parent)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(list(UUIDChild.objects.values_list('pk', 'title')), [(child.pk, 'renamed')])
+
+    def test_row_deleted_after_validation_is_not_recreated(self):
+        form = UpsertParentForm({
+            'name': 'parent',
+            'children.0.pk': str(self.child.pk),
+            'children.0.title': 'renamed',
+            'children.0.count': '1',
+        }, instance=self.parent)
+        self.assertTrue(form.is_valid(), form.errors)
+        # another request deletes the row between validation and saving
+        Child.objects.filter(pk=self.child.pk).delete()
+        form.save()
+        self.assertFalse(Child.objects.filter(pk=self.child.pk).exists())
+
+    def test_upsert_falls_back_for_inherited_model(self):
+        item = InheritedItem.objects.create(title='item', note='note')
+        form = InheritedItemParentForm({
+            'name': 'parent',
+            'items.0.pk': str(item.pk),
+            'items.0.title': 'renamed',
+            'items.0.note': 'edited',
+        }, instance=self.parent)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(list(InheritedItem.objects.values_list('title', 'note')), [('renamed', 'edited')])
+
+
+class LayoutParentForm(SilicaModelFormMixin):
+    class Meta:
+        model = Parent
+        fields = ['name']
+        layout = VerticalLayout('name')
+
+
+class StaticParentForm(SilicaModelFormMixin):
+    class Meta:
+        model = Parent
+        fields = ['name']
+        static_schema = True
+
+
+class TestStaticSchema(BaseTestCase):
+    def test_schemas_are_copied_for_each_caller(self):
+        first = StaticParentForm()
+        first.get_ui_schema()['elements'].append({'type': 'Control', 'scope': '#/properties/extra'})
+        first.get_data_schema()['properties']['extra'] = {'type': 'string'}
+        second = StaticParentForm()
+        self.assertEqual(len(second.get_ui_schema()['elements']), 1)
+        self.assertNotIn('extra', second.get_data_schema()['properties'])
+
+
+class TestLayout(BaseTestCase):
+    def test_ui_schema_is_reused_for_the_same_form(self):
+        form = LayoutParentForm()
+        self.assertIs(form.get_ui_schema(), form.get_ui_schema())
+
+    def test_ui_schema_is_rebuilt_for_another_form(self):
+        # both forms share the layout declared on Meta, but each must get the schema of its own fields
+        first = LayoutParentForm()
+        first.fields['name'].label = 'First'
+        second = LayoutParentForm()
+        second.fields['name'].label = 'Second'
+        self.assertEqual(first.get_ui_schema()['elements'][0]['label'], 'First')
+        self.assertEqual(second.get_ui_schema()['elements'][0]['label'], 'Second')
+        self.assertEqual(first.get_ui_schema()['elements'][0]['label'], 'First')
+
+
+class TestArrayData(BaseTestCase):
+    def setUp(self):
+        self.form = ParentForm()
+
+    def test_has_array_keys(self):
+        self.assertTrue(_has_array_keys({'name': 'parent', 'children.0.title': 'a'}))
+        self.assertTrue(_has_array_keys(QueryDict('children.0.title=a')))
+        self.assertFalse(_has_array_keys({'name': 'parent'}))
+        self.assertFalse(_has_array_keys({1: 'not a string key'}))
+        self.assertFalse(_has_array_keys({}))
+        self.assertFalse(_has_array_keys(None))
+
+    def test_extract_array_info(self):
+        data = {'name': 'parent', 'children.0.title': 'a', 'children.0.count': '1', 'children.1.title': 'b'}
+        array_keys, array_data = self.form._extract_array_info(data)
+        self.assertEqual(array_keys, ['children.0.title', 'children.0.count', 'children.1.title'])
+        self.assertEqual(array_data, {'children': [{'title': 'a', 'count': '1'}, {'title': 'b'}]})
+        self.assertEqual(self.form._extract_array_info({'name': 'parent'}), ([], {}))
+        self.assertEqual(self.form._extract_array_info(None), ([], {}))
+
+    def test_extract_nested_field_name(self):
+        # everything after the item number belongs to the item's field name
+        array_keys, array_data = self.form._extract_array_info({'children.0.meta.title': 'a'})
+        self.assertEqual(array_keys, ['children.0.meta.title'])
+        self.assertEqual(array_data, {'children': [{'meta.title': 'a'}]})
+
+    def test_extract_incomplete_keys(self):
+        # keys without an item number or a field name are not array keys
+        data = {'children.': 'a', 'children.0': 'b', 'children.0.': 'c'}
+        self.assertEqual(self.form._extract_array_info(data), ([], {}))
+
+    def test_process_dict(self):
+        data = {'name': 'parent', 'children.0.title': 'a'}
+        processed = self.form._process_array_data(data)
+        self.assertEqual(processed, {'name': 'parent', 'children': [{'title': 'a'}]})
+        # the submitted data is copied rather than changed
+        self.assertEqual(data, {'name': 'parent', 'children.0.title': 'a'})
+
+    def test_process_query_dict(self):
+        data = QueryDict('name=parent&tags=a&tags=b&children.0.title=a')
+        processed = self.form._process_array_data(data)
+        self.assertIsInstance(processed, QueryDict)
+        self.assertEqual(processed.getlist('tags'), ['a', 'b'])
+        self.assertEqual(processed['name'], 'parent')
+        self.assertEqual(processed['children'], [{'title': 'a'}])
+        self.assertNotIn('children.0.title', processed)
+        self.assertIn('children.0.title', data)
+
+    def test_process_multi_value_dict(self):
+        data = MultiValueDict({'tags': ['a', 'b'], 'children.0.title': ['a']})
+        processed = self.form._process_array_data(data)
+        self.assertIsInstance(processed, MultiValueDict)
+        self.assertEqual(processed.getlist('tags'), ['a', 'b'])
+        self.assertEqual(processed['children'], [{'title': 'a'}])
+        self.assertNotIn('children.0.title', processed)
+
+    def test_data_none_is_unbound(self):
+        self.assertFalse(ParentForm(data=None).is_bound)
+        self.assertFalse(ParentForm(None).is_bound)
+
+    def test_positional_and_keyword_data(self):
+        data = {'name': 'parent', 'children.0.title': 'a', 'children.0.count': '1'}
+        positional = ParentForm(data)
+        keyword = ParentForm(data=data)
+        self.assertEqual(positional.data, {'name': 'parent', 'children': [{'title': 'a', 'count': '1'}]})
+        self.assertEqual(keyword.data, positional.data)
+
+
+class TestSkipUnchanged(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = Parent.objects.create(name='parent')
+        cls.child = Child.objects.create(parent=cls.parent, title='child', count=1, kind='a')
+
+    def get_form(self, form_class=SkipUnchangedParentForm, **item):
+        # the submitted values of the existing child, as strings as they would be POSTed
+        item = {
+            'pk': str(self.child.pk),
+            'title': 'child',
+            'count': '1',
+            'kind': 'a',
+            'parent': str(self.parent.pk),
+            **item
+        }
+        data = {f'children.0.{name}': value for name, value in item.items() if value is not None}
+        return form_class({'name': 'parent', **data}, instance=self.parent)
+
+    def test_unchanged_row_is_skipped(self):
+        form = self.get_form()
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['children'], [])
+
+    def test_changed_row_is_validated(self):
+        form = self.get_form(title='renamed')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(len(form.cleaned_data['children']), 1)
+        form.save()
+        self.assertEqual(Child.objects.get(pk=self.child.pk).title, 'renamed')
+
+    def test_changed_choice_is_validated(self):
+        form = self.get_form(kind='b')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(len(form.cleaned_data['children']), 1)
+
+    def test_changed_foreign_key_is_validated(self):
+        form = self.get_form(parent='')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(len(form.cleaned_data['children']), 1)
+
+    def test_missing_field_is_validated(self):
+        # a row without one of the form's fields counts as changed, so the item form still reports it as missing
+        form = self.get_form(count=None)
+        self.assertFalse(form.is_valid())
+        self.assertIn('children', form.errors)
+
+    def test_field_added_in_init_is_compared(self):
+        form = self.get_form(form_class=TitleOnlyParentForm, count='2', kind=None, parent=None)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(len(form.cleaned_data['children']), 1)
+
+    def test_unchanged_row_is_validated_by_default(self):
+        form = self.get_form(form_class=ParentForm)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(len(form.cleaned_data['children']), 1)
 
 if __name__ == "__main__":
     unittest.main()
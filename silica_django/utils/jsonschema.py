@@ -2,9 +2,12 @@ from typing import Dict, Any
 
 
 class JsonSchemaUtils:
+    __slots__ = ()
+
     @staticmethod
     def value_as_jsonschema(value) -> Dict[str, Any]:
-        if type(value) == list:
-            return {"enum": value}
+        if isinstance(value, (list, tuple, set, frozenset)):
+            # tuples and sets are not serialized as arrays by every encoder, so always emit a list
+            return {"enum": value if isinstance(value, list) else list(value)}
         else:
             return {"const": value}
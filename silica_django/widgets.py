@@ -6,9 +6,9 @@ class SilicaRenderer(django.forms.Widget):
 
     def __init__(self, *args, custom_component_name=None, **kwargs):
         super().__init__(*args, **kwargs)
-        if custom_component_name:
-            self.custom_component_name = custom_component_name
+        # subclasses such as SilicaSubmitRenderer provide their component name as a class default
+        self.custom_component_name = custom_component_name or type(self).custom_component_name
 
 
-class SilicaSubmitRenderer(SilicaRenderer, django.forms.CharField):
+class SilicaSubmitRenderer(SilicaRenderer):
     custom_component_name = "silica-submit-renderer"